@@ -21,10 +21,27 @@ from pixell.sdk import AgentServer, MessageContext
 # Create exports directory
 EXPORTS_DIR = Path(__file__).parent / "exports"
 EXPORTS_DIR.mkdir(exist_ok=True)
+# Resolved once so each request builds its file path with a plain string join
+EXPORTS_DIR_STR = str(EXPORTS_DIR.resolve())
 
 # Get port from environment variable
 PORT = int(os.environ.get("PORT", "8001"))
 
+# HTML written for every message; formatted per request with str.format
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+    <title>Test File Output</title>
+</head>
+<body>
+    <h1>Test File Created</h1>
+    <p>This file was created by the test agent.</p>
+    <p>Message received: {message}</p>
+    <p>Timestamp: {timestamp}</p>
+    <p>Session ID: {session_id}</p>
+</body>
+</html>"""
+
 # Create the agent server with outputs_dir configured
 server = AgentServer(
     agent_id="test-file-agent",
@@ -36,6 +53,15 @@ server = AgentServer(
 )
 
 
+def write_file(filepath: str, data: bytes) -> None:
+    """Write the file in one unbuffered write - no TextIOWrapper/BufferedWriter."""
+    fd = os.open(filepath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
+
+
 @server.on_message
 async def handle_message(ctx: MessageContext) -> None:
     """Handle incoming messages by creating a test file."""
@@ -44,27 +70,21 @@ async def handle_message(ctx: MessageContext) -> None:
     await ctx.stream.emit_status("working", "Creating test file...")
 
     # Generate unique filename
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    now = datetime.now()
+    timestamp = now.strftime("%Y%m%d_%H%M%S")
     filename = f"test_output_{timestamp}.html"
-    filepath = EXPORTS_DIR / filename
+    filepath = os.path.join(EXPORTS_DIR_STR, filename)
 
     # Create test HTML content
-    html_content = f"""<!DOCTYPE html>
-<html>
-<head>
-    <title>Test File Output</title>
-</head>
-<body>
-    <h1>Test File Created</h1>
-    <p>This file was created by the test agent.</p>
-    <p>Message received: {ctx.message}</p>
-    <p>Timestamp: {datetime.now().isoformat()}</p>
-    <p>Session ID: {ctx.session_id}</p>
-</body>
-</html>"""
+    html_content = HTML_TEMPLATE.format(
+        message=ctx.message,
+        timestamp=now.isoformat(timespec="seconds"),
+        session_id=ctx.session_id,
+    )
 
-    # Write the file
-    filepath.write_text(html_content)
+    # Disk I/O runs in a worker thread so it never stalls the event loop
+    data = html_content.encode("utf-8")
+    await asyncio.to_thread(write_file, filepath, data)
 
     # Emit file_created event using the SDK helper
     await ctx.emit_file_created(
@@ -72,7 +92,7 @@ async def handle_message(ctx: MessageContext) -> None:
         name=filename,
         format="html",
         summary="Test file created for E2E testing",
-        size=len(html_content),
+        size=len(data),
     )
 
     # Emit completion
@@ -90,5 +110,11 @@ if __name__ == "__main__":
     import logging
     logging.basicConfig(level=logging.INFO)
 
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:  # Not available on Windows - keep the stdlib loop
+        pass
+
     print(f"Starting Test File Agent on port {PORT}...")
     server.run()
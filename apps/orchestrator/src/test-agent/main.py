@@ -10,6 +10,9 @@ Environment Variables:
   - TEST_AGENT_PORT: Port to run the agent on (default: 9999)
   - TEST_SCENARIO: Which test scenario to run (default: full_plan_mode)
   - TEST_AGENT_DELAY_MS: Delay between events in ms (default: 50)
+  - TEST_AGENT_WORKERS: Number of server processes (default: 1)
+  - TEST_AGENT_PING_S: Idle seconds before an SSE keepalive comment (default: 15, 0 disables)
+  - LOG_LEVEL: Agent log level; per-request lines are DEBUG (default: INFO)
 
 Usage:
   python main.py
@@ -23,18 +26,27 @@ Test Scenarios:
 """
 
 import asyncio
-import json
+import functools
+import itertools
+import logging
+import logging.handlers
 import os
+import queue
+import re
 import sys
 import time
 import uuid
+from collections import OrderedDict
+from collections.abc import AsyncGenerator, AsyncIterator, Callable, Iterator
 from contextlib import asynccontextmanager
-from typing import Any, AsyncGenerator, Dict, List, Optional, Literal
+from multiprocessing.managers import BaseManager, DictProxy
+from typing import Any
 from dataclasses import dataclass, field
 
+import orjson
 from fastapi import FastAPI, Request
-from fastapi.responses import StreamingResponse, JSONResponse
-import uvicorn
+from fastapi.responses import Response, StreamingResponse
+from starlette.types import Receive, Scope, Send
 
 
 # =============================================================================
@@ -44,69 +56,538 @@ import uvicorn
 TEST_AGENT_PORT = int(os.environ.get("TEST_AGENT_PORT", "9999"))
 TEST_SCENARIO = os.environ.get("TEST_SCENARIO", "full_plan_mode")
 TEST_AGENT_DELAY_MS = int(os.environ.get("TEST_AGENT_DELAY_MS", "50"))
+EVENT_DELAY_S = TEST_AGENT_DELAY_MS / 1000.0
+TEST_AGENT_WORKERS = max(1, int(os.environ.get("TEST_AGENT_WORKERS", "1")))
+# Set by the entry point for worker processes so they share session state
+SESSION_SERVER = os.environ.get("TEST_AGENT_SESSION_SERVER", "")
+SESSION_AUTHKEY = os.environ.get("TEST_AGENT_SESSION_AUTHKEY", "")
+# With no pacing delay, consecutive frames are coalesced into a single write
+COALESCE_FRAMES = TEST_AGENT_DELAY_MS == 0
+# Keepalive comments stop proxies and clients from dropping idle streams
+SSE_PING_S = float(os.environ.get("TEST_AGENT_PING_S", "15"))
 AGENT_ID = "test-workflow-agent"
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+
+# Log records are only queued on the event loop; lifespan() attaches the queue
+# handler and runs the listener thread that does the actual stdout writes.
+# Nothing is attached at import, as spawned workers import this file twice.
+logger = logging.getLogger("test_agent")
+logger.setLevel(LOG_LEVEL)
+logger.propagate = False
 
 
 # =============================================================================
 # SSE Event Helpers
 # =============================================================================
 
-def sse_event(event_type: str, data: Dict[str, Any]) -> str:
+# Ids only need to be unique within this process, so a PID-seeded counter
+# stands in for uuid4() and its os.urandom() call on every event
+_ID_PREFIX = f"{os.getpid():x}"
+_next_id = itertools.count().__next__
+
+
+def fast_id() -> str:
+    """Return a process-unique id for events, clarifications, selections and plans."""
+    return f"{_ID_PREFIX}{_next_id():08x}"
+
+
+def sse_event(event_type: str, data: dict[str, Any]) -> bytes:
     """Format an SSE event with proper line endings."""
-    event_id = str(uuid.uuid4())[:8]
-    return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n"
+    return b"id: %s\nevent: %s\ndata: %s\n\n" % (fast_id().encode(), event_type.encode(), orjson.dumps(data))
+
+
+def json_rpc_response(request_id: str, result: dict[str, Any]) -> bytes:
+    """Format a JSON-RPC streaming response as pre-encoded bytes."""
+    # One %-format builds the frame without intermediate concatenations
+    return b"data: %s\n\n" % orjson.dumps({"jsonrpc": "2.0", "id": request_id, "result": result})
+
+
+# A JSON string value of the form "__NAME__" in a frame template becomes the
+# %-format slot `name`, filled with a JSON-encoded value by render_frame()
+_TEMPLATE_SENTINEL = re.compile(rb'"__([A-Z_]+)__"')
+
+
+def frame_template(result: dict[str, Any]) -> bytes:
+    """
+    Pre-serialize a JSON-RPC frame at import time.
+
+    Use "__SESSION_ID__", "__WORKFLOW_ID__", etc. as values in `result` for
+    anything that varies per request; the request id slot is added here.
+    """
+    frame = json_rpc_response("__REQUEST_ID__", result).replace(b"%", b"%%")
+    return _TEMPLATE_SENTINEL.sub(lambda m: b"%(" + m.group(1).lower() + b")s", frame)
+
+
+def render_frame(template: bytes, request_id: str, session_id: str, **values: Any) -> bytes:
+    """Fill a frame_template() with JSON-encoded per-request values."""
+    slots = {b"request_id": orjson.dumps(request_id), b"session_id": orjson.dumps(session_id)}
+    for name, value in values.items():
+        slots[name.encode()] = orjson.dumps(value)
+    return template % slots
+
+
+def paced(frames_fn: Callable[..., Iterator[bytes]]) -> Callable[..., AsyncGenerator[bytes, None]]:
+    """
+    Turn a generator of frames into an SSE stream with the configured delay
+    between frames. When COALESCE_FRAMES is set, all frames go out as one
+    chunk so the server issues a single send and never yields to the loop.
+
+    Frames are paced against deadlines taken from one clock read at stream
+    start, so time spent sending does not add up across frames.
+
+    All frames are built up front, which applies the runner's session
+    changes; the session is published before the first frame goes out, since
+    the client may follow up on another worker as soon as it sees one.
+    """
+    @functools.wraps(frames_fn)
+    async def stream(request_id: str, session_id: str, *args: Any) -> AsyncGenerator[bytes, None]:
+        frames = list(frames_fn(request_id, session_id, *args))
+        await sessions.publish(session_id)
+        if COALESCE_FRAMES:
+            chunk = b"".join(frames)
+            if chunk:
+                yield chunk
+            return
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        for i, frame in enumerate(frames):
+            if i:
+                deadline += EVENT_DELAY_S
+                await asyncio.sleep(deadline - loop.time())
+            yield frame
+    return stream
+
+
+# =============================================================================
+# Pre-serialized Frames
+# =============================================================================
+
+def _working_frame(text: str, metadata: dict[str, Any] | None = None) -> bytes:
+    """Template for a `working` status update carrying a single text part."""
+    message: dict[str, Any] = {"role": "assistant", "parts": [{"text": text}]}
+    if metadata is not None:
+        message["metadata"] = metadata
+    return frame_template({
+        "kind": "status-update",
+        "sessionId": "__SESSION_ID__",
+        "status": {"state": "working", "message": message}
+    })
+
+
+def _input_required_frame(data: dict[str, Any]) -> bytes:
+    """Template for an `input-required` status update carrying a data part."""
+    return frame_template({
+        "kind": "status-update",
+        "sessionId": "__SESSION_ID__",
+        "status": {
+            "state": "input-required",
+            "message": {
+                "role": "assistant",
+                "parts": [{"data": data}]
+            }
+        }
+    })
+
+
+def _clarification_frame(questions: list[dict[str, Any]], message: str, **extra: Any) -> bytes:
+    """Template for a `clarification_needed` input request."""
+    return _input_required_frame({
+        "type": "clarification_needed",
+        "workflowId": "__WORKFLOW_ID__",
+        "clarificationId": "__CLARIFICATION_ID__",
+        "questions": questions,
+        "message": message,
+        **extra
+    })
+
+
+def _message_frame(text: str) -> bytes:
+    """Template for a final `message` response."""
+    return frame_template({
+        "kind": "message",
+        "sessionId": "__SESSION_ID__",
+        "parts": [{"text": text}]
+    })
+
+
+ANALYZING_FRAME = _working_frame("Analyzing your request...", {"event_type": "analyzing"})
+PROCESSING_FRAME = _working_frame("Processing your request...", {"event_type": "processing"})
+STARTING_EXECUTION_FRAME = _working_frame("Starting execution...", {"event_type": "executing"})
+EXECUTION_PROGRESS_FRAME = _working_frame(
+    "Processing step 1 of 3...", {"event_type": "executing", "step": 1, "total": 3}
+)
+ONE_MORE_QUESTION_FRAME = _working_frame("Great! I have one more question...")
+LONG_OPERATION_FRAME = _working_frame("Starting long operation...")
+
+EXECUTION_STEP_FRAMES = tuple(
+    _working_frame(step, {"event_type": "executing", "step": i + 1, "total": 3})
+    for i, step in enumerate(["Fetching posts...", "Analyzing sentiment...", "Generating report..."])
+)
+
+EXECUTION_FAILED_FRAME = frame_template({
+    "kind": "status-update",
+    "sessionId": "__SESSION_ID__",
+    "status": {
+        "state": "failed",
+        "message": {
+            "role": "assistant",
+            "parts": [{
+                "text": "Error: Connection to external API timed out after 30 seconds"
+            }]
+        }
+    }
+})
+
+UNKNOWN_RESPONSE_FRAME = frame_template({
+    "kind": "status-update",
+    "sessionId": "__SESSION_ID__",
+    "status": {
+        "state": "failed",
+        "message": {
+            "role": "assistant",
+            "parts": [{"text": "Unknown response type"}]
+        }
+    }
+})
+
+FILE_CREATED_FRAME = frame_template({
+    "kind": "status-update",
+    "sessionId": "__SESSION_ID__",
+    "status": {
+        "state": "working",
+        "message": {
+            "role": "assistant",
+            "parts": [{
+                "data": {
+                    "type": "file_created",
+                    "path": "/reports/analysis-report.html",
+                    "name": "analysis-report.html",
+                    "format": "html",
+                    "size": 45678,
+                    "summary": "Comprehensive analysis report with sentiment breakdown"
+                }
+            }]
+        }
+    }
+})
+
+ANALYSIS_CANCELLED_FRAME = _message_frame(
+    "Analysis cancelled. Let me know if you'd like to try something different."
+)
+ANALYSIS_COMPLETE_FRAME = _message_frame(
+    "Analysis complete! I analyzed the selected subreddits and found:\n\n"
+    "- **Overall Sentiment**: 67% positive\n"
+    "- **Trending Topics**: AI, Climate, Gaming\n"
+    "- **Peak Activity**: Weekday evenings\n\n"
+    "The detailed report has been saved."
+)
+
+TOPIC_CLARIFICATION_FRAME = _clarification_frame(
+    [
+        {
+            "questionId": "topic",
+            "questionType": "single_choice",
+            "question": "What topic are you interested in?",
+            "header": "Topic",
+            "options": [
+                {"id": "tech", "label": "Technology", "description": "Tech news and discussions"},
+                {"id": "science", "label": "Science", "description": "Scientific discoveries"},
+                {"id": "gaming", "label": "Gaming", "description": "Video games and esports"}
+            ]
+        },
+        {
+            "questionId": "depth",
+            "questionType": "single_choice",
+            "question": "How deep should the analysis be?",
+            "header": "Depth",
+            "options": [
+                {"id": "quick", "label": "Quick scan", "description": "Surface-level analysis"},
+                {"id": "detailed", "label": "Detailed", "description": "In-depth analysis"}
+            ]
+        }
+    ],
+    "I need a bit more information to proceed.",
+    timeoutMs=300000
+)
+
+CATEGORY_CLARIFICATION_FRAME = _clarification_frame(
+    [{
+        "questionId": "category",
+        "questionType": "single_choice",
+        "question": "What category are you interested in?",
+        "header": "Category",
+        "options": [
+            {"id": "news", "label": "News", "description": "Current events"},
+            {"id": "entertainment", "label": "Entertainment", "description": "Movies, TV, etc."}
+        ]
+    }],
+    "First, let me understand your category preference."
+)
 
+TIMEFRAME_CLARIFICATION_FRAME = _clarification_frame(
+    [{
+        "questionId": "timeframe",
+        "questionType": "single_choice",
+        "question": "What timeframe should I analyze?",
+        "header": "Timeframe",
+        "options": [
+            {"id": "day", "label": "Last 24 hours", "description": "Recent content"},
+            {"id": "week", "label": "Last week", "description": "Weekly trends"},
+            {"id": "month", "label": "Last month", "description": "Monthly overview"}
+        ]
+    }],
+    "One more detail - what timeframe?"
+)
 
-def json_rpc_response(request_id: str, result: Dict[str, Any]) -> str:
-    """Format a JSON-RPC streaming response."""
-    return f"data: {json.dumps({'jsonrpc': '2.0', 'id': request_id, 'result': result})}\n\n"
 
+# =============================================================================
+# Shared Payload Pieces (reused across requests - never mutate)
+# =============================================================================
 
-async def delay():
-    """Add configured delay between events."""
-    await asyncio.sleep(TEST_AGENT_DELAY_MS / 1000.0)
+# Discovery results only vary by topic: (id, name, description, memberCount)
+_DISCOVERED_SUBREDDITS = (
+    ("sub-1", "r/{topic}", "Main {topic} subreddit", 15000000),
+    ("sub-2", "r/{topic}news", "Latest {topic} news", 2500000),
+    ("sub-3", "r/ask{topic}", "Questions about {topic}", 1800000),
+)
+
+
+@functools.lru_cache(maxsize=64)
+def discovered_subreddits(topic: str) -> list[dict[str, Any]]:
+    """Subreddits "discovered" for a topic, built once per topic."""
+    return [
+        {
+            "id": item_id,
+            "name": name.format(topic=topic),
+            "description": description.format(topic=topic),
+            "memberCount": member_count
+        }
+        for item_id, name, description, member_count in _DISCOVERED_SUBREDDITS
+    ]
+
+
+PREVIEW_STEPS = [
+    {"id": "step-1", "description": "Fetch recent posts", "status": "pending"},
+    {"id": "step-2", "description": "Analyze sentiment", "status": "pending"},
+    {"id": "step-3", "description": "Generate report", "status": "pending"}
+]
+PREVIEW_SEARCH_KEYWORDS = ["trending", "popular", "discussion"]
+PREVIEW_HASHTAGS = ["#analysis", "#reddit"]
+
+# Frames whose content varies per request; the varying values are slots
+DISCOVERING_FRAME = _working_frame("__TEXT__", {"event_type": "discovering"})
+DIRECT_RESPONSE_FRAME = _message_frame("__TEXT__")
+
+DISCOVERY_RESULT_FRAME = _input_required_frame({
+    "type": "discovery_result",
+    "workflowId": "__WORKFLOW_ID__",
+    "discoveryId": "__DISCOVERY_ID__",
+    "discoveryType": "subreddits",
+    "items": "__ITEMS__",
+    "message": "__MESSAGE__"
+})
+
+SELECTION_REQUIRED_FRAME = _input_required_frame({
+    "type": "selection_required",
+    "workflowId": "__WORKFLOW_ID__",
+    "selectionId": "__SELECTION_ID__",
+    "items": "__ITEMS__",
+    "minSelect": 1,
+    "maxSelect": 3,
+    "message": "Please select which subreddits to analyze."
+})
+
+PREVIEW_READY_FRAME = _input_required_frame({
+    "type": "preview_ready",
+    "workflowId": "__WORKFLOW_ID__",
+    "planId": "__PLAN_ID__",
+    "title": "Analysis Plan",
+    "summary": "__SUMMARY__",
+    "steps": PREVIEW_STEPS,
+    "searchKeywords": PREVIEW_SEARCH_KEYWORDS,
+    "hashtags": PREVIEW_HASHTAGS,
+    "requiresApproval": True,
+    "message": "Here's my analysis plan. Ready to proceed?"
+})
 
 
 # =============================================================================
 # Session State Management (in-memory for tests)
 # =============================================================================
 
-@dataclass
+@dataclass(slots=True)
 class SessionState:
     """Track state for a single session."""
     session_id: str
     workflow_id: str
     current_phase: str = "initial"
-    clarification_responses: Dict[str, Any] = field(default_factory=dict)
-    selection_responses: Dict[str, List[str]] = field(default_factory=dict)
-    preview_responses: Dict[str, bool] = field(default_factory=dict)
+    # Response maps stay None until first written - most scenarios never touch them
+    clarification_responses: dict[str, Any] | None = None
+    selection_responses: dict[str, list[str]] | None = None
+    preview_responses: dict[str, bool] | None = None
     created_at: float = field(default_factory=time.time)
 
+    def record_clarification(self, answers: dict[str, Any]) -> None:
+        """Merge clarification answers into the session."""
+        if self.clarification_responses is None:
+            self.clarification_responses = {}
+        self.clarification_responses.update(answers)
+
+
+class SessionStore:
+    """
+    Bounded in-memory session store.
+
+    Recently created or touched sessions sit in a small hot dict; when it
+    fills up the oldest entry is demoted to an LRU-ordered cold store, and
+    the least recently used cold session is evicted once the overall limit
+    is reached. A cold hit is promoted back into the hot tier.
+
+    With several workers the local tiers act as a per-request cache in front
+    of a shared table: ``refresh()`` pulls a session in before a request is
+    handled and ``publish()`` writes it back before the first frame is sent.
+    """
+
+    def __init__(self, max_sessions: int, hot_size: int) -> None:
+        self._hot: dict[str, SessionState] = {}
+        self._cold: OrderedDict[str, SessionState] = OrderedDict()
+        self._hot_size = hot_size
+        self._cold_size = max_sessions - hot_size
+        self._shared: DictProxy | None = None
+
+    def attach_shared(self, shared: DictProxy) -> None:
+        """Back the store with a table shared between worker processes."""
+        self._shared = shared
+
+    def get(self, session_id: str) -> SessionState | None:
+        """Look up a session, promoting it to the hot tier on a cold hit."""
+        session = self._hot.get(session_id)
+        if session is None:
+            session = self._cold.pop(session_id, None)
+            if session is not None:
+                self._insert_hot(session_id, session)
+        return session
+
+    def set(self, session_id: str, session: SessionState) -> None:
+        """Store a session in the hot tier."""
+        self._cold.pop(session_id, None)
+        self._hot.pop(session_id, None)
+        self._insert_hot(session_id, session)
+
+    def pop(self, session_id: str) -> SessionState | None:
+        """Remove and return a session, if present."""
+        session = self._hot.pop(session_id, None)
+        if session is None:
+            session = self._cold.pop(session_id, None)
+        return session
+
+    async def snapshot(self) -> list[SessionState]:
+        """Snapshot of all sessions, least recently used first."""
+        if self._shared is not None:
+            values = await asyncio.to_thread(self._shared.values)
+            return [SessionState(**orjson.loads(data)) for data in values]
+        return [*self._cold.values(), *self._hot.values()]
+
+    async def aclear(self) -> None:
+        """Drop every session, including the shared table when sharing."""
+        self._hot.clear()
+        self._cold.clear()
+        if self._shared is not None:
+            await asyncio.to_thread(self._shared.clear)
+
+    async def refresh(self, session_id: str) -> None:
+        """Replace the local copy of a session with the shared one, if sharing."""
+        if self._shared is None:
+            return
+        data = await asyncio.to_thread(self._shared.get, session_id)
+        if data is None:
+            self.pop(session_id)
+        else:
+            self.set(session_id, SessionState(**orjson.loads(data)))
+
+    async def publish(self, session_id: str) -> None:
+        """Write the local copy of a session back to the shared table, if sharing."""
+        if self._shared is None:
+            return
+        session = self._hot.get(session_id) or self._cold.get(session_id)
+        if session is not None:
+            await asyncio.to_thread(self._shared.__setitem__, session_id, orjson.dumps(session))
+
+    def _insert_hot(self, session_id: str, session: SessionState) -> None:
+        if len(self._hot) >= self._hot_size:
+            # FIFO out of the hot tier, landing as most recent in the cold tier
+            oldest_id = next(iter(self._hot))
+            self._cold[oldest_id] = self._hot.pop(oldest_id)
+            if len(self._cold) > self._cold_size:
+                self._cold.popitem(last=False)
+        self._hot[session_id] = session
+
+
+# In-memory session store for test scenarios, bounded so a long-running
+# agent does not accumulate state from every test run
+MAX_SESSIONS = 1024
+HOT_SESSIONS = 256
+sessions = SessionStore(MAX_SESSIONS, HOT_SESSIONS)
+
+
+class SharedSessionTable(OrderedDict):
+    """
+    Session table served to worker processes by the supervising process.
+
+    Sessions are stored as orjson-encoded bytes so the server never has to
+    import this module to unpickle them; like the local store it is bounded,
+    dropping the least recently written session.
+    """
+
+    def __setitem__(self, session_id: str, data: bytes) -> None:
+        super().__setitem__(session_id, data)
+        self.move_to_end(session_id)
+        if len(self) > MAX_SESSIONS:
+            self.popitem(last=False)
+
+    def values(self) -> list[bytes]:
+        # Dict views cannot be pickled back to the calling worker
+        return list(super().values())
+
+
+_shared_sessions = SharedSessionTable()
+
+
+class SessionManager(BaseManager):
+    """Shares the session table between uvicorn worker processes."""
+
+
+SessionManager.register("sessions", callable=lambda: _shared_sessions, proxytype=DictProxy)
+
 
-# In-memory session store for test scenarios
-sessions: Dict[str, SessionState] = {}
+def connect_shared_sessions() -> DictProxy:
+    """Connect to the supervising process's session table (blocking)."""
+    host, port = SESSION_SERVER.rsplit(":", 1)
+    manager = SessionManager(address=(host, int(port)), authkey=bytes.fromhex(SESSION_AUTHKEY))
+    manager.connect()
+    return manager.sessions()
 
 
 def get_or_create_session(session_id: str, workflow_id: str) -> SessionState:
     """Get existing session or create new one."""
-    if session_id not in sessions:
-        sessions[session_id] = SessionState(
-            session_id=session_id,
-            workflow_id=workflow_id
-        )
-    return sessions[session_id]
+    session = sessions.get(session_id)
+    if session is None:
+        session = SessionState(session_id=session_id, workflow_id=workflow_id)
+        sessions.set(session_id, session)
+    return session
 
 
 # =============================================================================
 # Test Scenario Implementations
 # =============================================================================
 
-async def run_full_plan_mode(
+@paced
+def run_full_plan_mode(
     request_id: str,
     session_id: str,
     workflow_id: str,
     message: str
-) -> AsyncGenerator[str, None]:
+) -> Iterator[bytes]:
     """
     Full workflow: initial -> clarification -> discovery -> selection -> preview -> completed
 
@@ -115,212 +596,93 @@ async def run_full_plan_mode(
     session = get_or_create_session(session_id, workflow_id)
 
     # Phase 1: Working state (thinking indicator)
-    yield json_rpc_response(request_id, {
-        "kind": "status-update",
-        "sessionId": session_id,
-        "status": {
-            "state": "working",
-            "message": {
-                "role": "assistant",
-                "parts": [{"text": "Analyzing your request..."}],
-                "metadata": {"event_type": "analyzing"}
-            }
-        }
-    })
-    await delay()
+    yield render_frame(ANALYZING_FRAME, request_id, session_id)
 
     # Phase 2: Clarification needed - Agent needs more info
-    clarification_id = str(uuid.uuid4())
+    clarification_id = fast_id()
     session.current_phase = "clarification"
 
-    yield json_rpc_response(request_id, {
-        "kind": "status-update",
-        "sessionId": session_id,
-        "status": {
-            "state": "input-required",
-            "message": {
-                "role": "assistant",
-                "parts": [{
-                    "data": {
-                        "type": "clarification_needed",
-                        "workflowId": workflow_id,
-                        "clarificationId": clarification_id,
-                        "questions": [
-                            {
-                                "questionId": "topic",
-                                "questionType": "single_choice",
-                                "question": "What topic are you interested in?",
-                                "header": "Topic",
-                                "options": [
-                                    {"id": "tech", "label": "Technology", "description": "Tech news and discussions"},
-                                    {"id": "science", "label": "Science", "description": "Scientific discoveries"},
-                                    {"id": "gaming", "label": "Gaming", "description": "Video games and esports"}
-                                ]
-                            },
-                            {
-                                "questionId": "depth",
-                                "questionType": "single_choice",
-                                "question": "How deep should the analysis be?",
-                                "header": "Depth",
-                                "options": [
-                                    {"id": "quick", "label": "Quick scan", "description": "Surface-level analysis"},
-                                    {"id": "detailed", "label": "Detailed", "description": "In-depth analysis"}
-                                ]
-                            }
-                        ],
-                        "message": "I need a bit more information to proceed.",
-                        "timeoutMs": 300000
-                    }
-                }]
-            }
-        }
-    })
-    await delay()
+    yield render_frame(
+        TOPIC_CLARIFICATION_FRAME, request_id, session_id,
+        workflow_id=workflow_id, clarification_id=clarification_id
+    )
 
 
-async def run_full_plan_mode_continued(
+@paced
+def run_full_plan_mode_continued(
     request_id: str,
     session_id: str,
     workflow_id: str,
-    answers: Dict[str, Any]
-) -> AsyncGenerator[str, None]:
+    answers: dict[str, Any]
+) -> Iterator[bytes]:
     """
     Continue full_plan_mode after clarification response.
     Goes through discovery -> selection -> preview -> completed.
     """
     session = get_or_create_session(session_id, workflow_id)
-    session.clarification_responses.update(answers)
+    session.record_clarification(answers)
 
     # Extract user's topic choice
-    topic = answers.get("topic", "tech")
+    topic = str(answers.get("topic", "tech"))
 
     # Phase 3: Working - Discovery in progress
-    yield json_rpc_response(request_id, {
-        "kind": "status-update",
-        "sessionId": session_id,
-        "status": {
-            "state": "working",
-            "message": {
-                "role": "assistant",
-                "parts": [{"text": f"Discovering {topic}-related subreddits..."}],
-                "metadata": {"event_type": "discovering"}
-            }
-        }
-    })
-    await delay()
+    yield render_frame(DISCOVERING_FRAME, request_id, session_id, text=f"Discovering {topic}-related subreddits...")
 
     # Phase 4: Discovery result
-    discovery_id = str(uuid.uuid4())
+    discovery_id = fast_id()
     session.current_phase = "discovery"
 
-    discovered_items = [
-        {"id": "sub-1", "name": f"r/{topic}", "description": f"Main {topic} subreddit", "memberCount": 15000000},
-        {"id": "sub-2", "name": f"r/{topic}news", "description": f"Latest {topic} news", "memberCount": 2500000},
-        {"id": "sub-3", "name": f"r/ask{topic}", "description": f"Questions about {topic}", "memberCount": 1800000},
-    ]
+    discovered_items = discovered_subreddits(topic)
 
-    yield json_rpc_response(request_id, {
-        "kind": "status-update",
-        "sessionId": session_id,
-        "status": {
-            "state": "input-required",
-            "message": {
-                "role": "assistant",
-                "parts": [{
-                    "data": {
-                        "type": "discovery_result",
-                        "workflowId": workflow_id,
-                        "discoveryId": discovery_id,
-                        "discoveryType": "subreddits",
-                        "items": discovered_items,
-                        "message": f"I found {len(discovered_items)} subreddits related to {topic}."
-                    }
-                }]
-            }
-        }
-    })
-    await delay()
+    yield render_frame(
+        DISCOVERY_RESULT_FRAME, request_id, session_id,
+        workflow_id=workflow_id,
+        discovery_id=discovery_id,
+        items=discovered_items,
+        message=f"I found {len(discovered_items)} subreddits related to {topic}."
+    )
 
     # Phase 5: Selection required
-    selection_id = str(uuid.uuid4())
+    selection_id = fast_id()
     session.current_phase = "selection"
 
-    yield json_rpc_response(request_id, {
-        "kind": "status-update",
-        "sessionId": session_id,
-        "status": {
-            "state": "input-required",
-            "message": {
-                "role": "assistant",
-                "parts": [{
-                    "data": {
-                        "type": "selection_required",
-                        "workflowId": workflow_id,
-                        "selectionId": selection_id,
-                        "items": discovered_items,
-                        "minSelect": 1,
-                        "maxSelect": 3,
-                        "message": "Please select which subreddits to analyze."
-                    }
-                }]
-            }
-        }
-    })
-    await delay()
+    yield render_frame(
+        SELECTION_REQUIRED_FRAME, request_id, session_id,
+        workflow_id=workflow_id, selection_id=selection_id, items=discovered_items
+    )
 
 
-async def run_selection_to_completion(
+@paced
+def run_selection_to_completion(
     request_id: str,
     session_id: str,
     workflow_id: str,
-    selected_ids: List[str]
-) -> AsyncGenerator[str, None]:
+    selected_ids: list[str]
+) -> Iterator[bytes]:
     """
     Continue from selection -> preview -> completed.
     """
     session = get_or_create_session(session_id, workflow_id)
 
     # Phase 6: Preview ready
-    plan_id = str(uuid.uuid4())
+    plan_id = fast_id()
     session.current_phase = "preview"
 
-    yield json_rpc_response(request_id, {
-        "kind": "status-update",
-        "sessionId": session_id,
-        "status": {
-            "state": "input-required",
-            "message": {
-                "role": "assistant",
-                "parts": [{
-                    "data": {
-                        "type": "preview_ready",
-                        "workflowId": workflow_id,
-                        "planId": plan_id,
-                        "title": "Analysis Plan",
-                        "summary": f"I will analyze {len(selected_ids)} subreddits for trending topics and sentiment.",
-                        "steps": [
-                            {"id": "step-1", "description": "Fetch recent posts", "status": "pending"},
-                            {"id": "step-2", "description": "Analyze sentiment", "status": "pending"},
-                            {"id": "step-3", "description": "Generate report", "status": "pending"}
-                        ],
-                        "searchKeywords": ["trending", "popular", "discussion"],
-                        "hashtags": ["#analysis", "#reddit"],
-                        "requiresApproval": True,
-                        "message": "Here's my analysis plan. Ready to proceed?"
-                    }
-                }]
-            }
-        }
-    })
-    await delay()
+    yield render_frame(
+        PREVIEW_READY_FRAME, request_id, session_id,
+        workflow_id=workflow_id,
+        plan_id=plan_id,
+        summary=f"I will analyze {len(selected_ids)} subreddits for trending topics and sentiment."
+    )
 
 
-async def run_preview_to_completion(
+@paced
+def run_preview_to_completion(
     request_id: str,
     session_id: str,
     workflow_id: str,
     approved: bool
-) -> AsyncGenerator[str, None]:
+) -> Iterator[bytes]:
     """
     Complete the workflow after preview approval.
     """
@@ -329,76 +691,31 @@ async def run_preview_to_completion(
     if not approved:
         # User rejected - complete with rejection message
         session.current_phase = "completed"
-        yield json_rpc_response(request_id, {
-            "kind": "message",
-            "sessionId": session_id,
-            "parts": [{"text": "Analysis cancelled. Let me know if you'd like to try something different."}]
-        })
+        yield render_frame(ANALYSIS_CANCELLED_FRAME, request_id, session_id)
         return
 
     # Phase 7: Executing
     session.current_phase = "executing"
 
-    for i, step in enumerate(["Fetching posts...", "Analyzing sentiment...", "Generating report..."]):
-        yield json_rpc_response(request_id, {
-            "kind": "status-update",
-            "sessionId": session_id,
-            "status": {
-                "state": "working",
-                "message": {
-                    "role": "assistant",
-                    "parts": [{"text": step}],
-                    "metadata": {"event_type": "executing", "step": i + 1, "total": 3}
-                }
-            }
-        })
-        await delay()
+    for step_frame in EXECUTION_STEP_FRAMES:
+        yield render_frame(step_frame, request_id, session_id)
 
     # Phase 8: File created (output)
-    yield json_rpc_response(request_id, {
-        "kind": "status-update",
-        "sessionId": session_id,
-        "status": {
-            "state": "working",
-            "message": {
-                "role": "assistant",
-                "parts": [{
-                    "data": {
-                        "type": "file_created",
-                        "path": "/reports/analysis-report.html",
-                        "name": "analysis-report.html",
-                        "format": "html",
-                        "size": 45678,
-                        "summary": "Comprehensive analysis report with sentiment breakdown"
-                    }
-                }]
-            }
-        }
-    })
-    await delay()
+    yield render_frame(FILE_CREATED_FRAME, request_id, session_id)
 
     # Phase 9: Completed
     session.current_phase = "completed"
 
-    yield json_rpc_response(request_id, {
-        "kind": "message",
-        "sessionId": session_id,
-        "parts": [{
-            "text": "Analysis complete! I analyzed the selected subreddits and found:\n\n"
-                    "- **Overall Sentiment**: 67% positive\n"
-                    "- **Trending Topics**: AI, Climate, Gaming\n"
-                    "- **Peak Activity**: Weekday evenings\n\n"
-                    "The detailed report has been saved."
-        }]
-    })
+    yield render_frame(ANALYSIS_COMPLETE_FRAME, request_id, session_id)
 
 
-async def run_direct_execution(
+@paced
+def run_direct_execution(
     request_id: str,
     session_id: str,
     workflow_id: str,
     message: str
-) -> AsyncGenerator[str, None]:
+) -> Iterator[bytes]:
     """
     Direct execution without plan mode - goes straight to completion.
     Tests the simple path without clarification/selection phases.
@@ -406,38 +723,24 @@ async def run_direct_execution(
     session = get_or_create_session(session_id, workflow_id)
 
     # Simple working state
-    yield json_rpc_response(request_id, {
-        "kind": "status-update",
-        "sessionId": session_id,
-        "status": {
-            "state": "working",
-            "message": {
-                "role": "assistant",
-                "parts": [{"text": "Processing your request..."}],
-                "metadata": {"event_type": "processing"}
-            }
-        }
-    })
-    await delay()
+    yield render_frame(PROCESSING_FRAME, request_id, session_id)
 
     # Complete immediately
     session.current_phase = "completed"
 
-    yield json_rpc_response(request_id, {
-        "kind": "message",
-        "sessionId": session_id,
-        "parts": [{
-            "text": f"I received your message: '{message}'\n\nThis is a direct execution response without plan mode."
-        }]
-    })
+    yield render_frame(
+        DIRECT_RESPONSE_FRAME, request_id, session_id,
+        text=f"I received your message: '{message}'\n\nThis is a direct execution response without plan mode."
+    )
 
 
-async def run_error_mid_execution(
+@paced
+def run_error_mid_execution(
     request_id: str,
     session_id: str,
     workflow_id: str,
     message: str
-) -> AsyncGenerator[str, None]:
+) -> Iterator[bytes]:
     """
     Simulates an error occurring during execution phase.
     Tests error handling and recovery.
@@ -445,156 +748,62 @@ async def run_error_mid_execution(
     session = get_or_create_session(session_id, workflow_id)
 
     # Start working
-    yield json_rpc_response(request_id, {
-        "kind": "status-update",
-        "sessionId": session_id,
-        "status": {
-            "state": "working",
-            "message": {
-                "role": "assistant",
-                "parts": [{"text": "Starting execution..."}],
-                "metadata": {"event_type": "executing"}
-            }
-        }
-    })
-    await delay()
+    yield render_frame(STARTING_EXECUTION_FRAME, request_id, session_id)
 
     # Simulate progress
-    yield json_rpc_response(request_id, {
-        "kind": "status-update",
-        "sessionId": session_id,
-        "status": {
-            "state": "working",
-            "message": {
-                "role": "assistant",
-                "parts": [{"text": "Processing step 1 of 3..."}],
-                "metadata": {"event_type": "executing", "step": 1, "total": 3}
-            }
-        }
-    })
-    await delay()
+    yield render_frame(EXECUTION_PROGRESS_FRAME, request_id, session_id)
 
     # Error occurs
     session.current_phase = "error"
 
-    yield json_rpc_response(request_id, {
-        "kind": "status-update",
-        "sessionId": session_id,
-        "status": {
-            "state": "failed",
-            "message": {
-                "role": "assistant",
-                "parts": [{
-                    "text": "Error: Connection to external API timed out after 30 seconds"
-                }]
-            }
-        }
-    })
+    yield render_frame(EXECUTION_FAILED_FRAME, request_id, session_id)
 
 
-async def run_multi_clarification(
+@paced
+def run_multi_clarification(
     request_id: str,
     session_id: str,
     workflow_id: str,
     message: str
-) -> AsyncGenerator[str, None]:
+) -> Iterator[bytes]:
     """
     Multiple rounds of clarification - tests clarification->clarification transition.
     """
     session = get_or_create_session(session_id, workflow_id)
 
     # First clarification
-    clarification_id_1 = str(uuid.uuid4())
+    clarification_id_1 = fast_id()
     session.current_phase = "clarification"
 
-    yield json_rpc_response(request_id, {
-        "kind": "status-update",
-        "sessionId": session_id,
-        "status": {
-            "state": "input-required",
-            "message": {
-                "role": "assistant",
-                "parts": [{
-                    "data": {
-                        "type": "clarification_needed",
-                        "workflowId": workflow_id,
-                        "clarificationId": clarification_id_1,
-                        "questions": [{
-                            "questionId": "category",
-                            "questionType": "single_choice",
-                            "question": "What category are you interested in?",
-                            "header": "Category",
-                            "options": [
-                                {"id": "news", "label": "News", "description": "Current events"},
-                                {"id": "entertainment", "label": "Entertainment", "description": "Movies, TV, etc."}
-                            ]
-                        }],
-                        "message": "First, let me understand your category preference."
-                    }
-                }]
-            }
-        }
-    })
+    yield render_frame(
+        CATEGORY_CLARIFICATION_FRAME, request_id, session_id,
+        workflow_id=workflow_id, clarification_id=clarification_id_1
+    )
 
 
-async def run_multi_clarification_round2(
+@paced
+def run_multi_clarification_round2(
     request_id: str,
     session_id: str,
     workflow_id: str,
-    answers: Dict[str, Any]
-) -> AsyncGenerator[str, None]:
+    answers: dict[str, Any]
+) -> Iterator[bytes]:
     """
     Second clarification round after first answer.
     """
     session = get_or_create_session(session_id, workflow_id)
-    session.clarification_responses.update(answers)
+    session.record_clarification(answers)
 
     # Acknowledge first answer
-    yield json_rpc_response(request_id, {
-        "kind": "status-update",
-        "sessionId": session_id,
-        "status": {
-            "state": "working",
-            "message": {
-                "role": "assistant",
-                "parts": [{"text": "Great! I have one more question..."}]
-            }
-        }
-    })
-    await delay()
+    yield render_frame(ONE_MORE_QUESTION_FRAME, request_id, session_id)
 
     # Second clarification
-    clarification_id_2 = str(uuid.uuid4())
+    clarification_id_2 = fast_id()
 
-    yield json_rpc_response(request_id, {
-        "kind": "status-update",
-        "sessionId": session_id,
-        "status": {
-            "state": "input-required",
-            "message": {
-                "role": "assistant",
-                "parts": [{
-                    "data": {
-                        "type": "clarification_needed",
-                        "workflowId": workflow_id,
-                        "clarificationId": clarification_id_2,
-                        "questions": [{
-                            "questionId": "timeframe",
-                            "questionType": "single_choice",
-                            "question": "What timeframe should I analyze?",
-                            "header": "Timeframe",
-                            "options": [
-                                {"id": "day", "label": "Last 24 hours", "description": "Recent content"},
-                                {"id": "week", "label": "Last week", "description": "Weekly trends"},
-                                {"id": "month", "label": "Last month", "description": "Monthly overview"}
-                            ]
-                        }],
-                        "message": "One more detail - what timeframe?"
-                    }
-                }]
-            }
-        }
-    })
+    yield render_frame(
+        TIMEFRAME_CLARIFICATION_FRAME, request_id, session_id,
+        workflow_id=workflow_id, clarification_id=clarification_id_2
+    )
 
 
 async def run_timeout_scenario(
@@ -602,27 +811,39 @@ async def run_timeout_scenario(
     session_id: str,
     workflow_id: str,
     message: str
-) -> AsyncGenerator[str, None]:
+) -> AsyncGenerator[bytes, None]:
     """
     Never responds - for testing timeout handling.
     """
     session = get_or_create_session(session_id, workflow_id)
+    await sessions.publish(session_id)
 
     # Send initial working state
-    yield json_rpc_response(request_id, {
-        "kind": "status-update",
-        "sessionId": session_id,
-        "status": {
-            "state": "working",
-            "message": {
-                "role": "assistant",
-                "parts": [{"text": "Starting long operation..."}]
-            }
-        }
-    })
-
-    # Sleep forever (or until client times out)
-    await asyncio.sleep(600)  # 10 minutes - client should timeout first
+    yield render_frame(LONG_OPERATION_FRAME, request_id, session_id)
+
+    # Hold the stream open until the client times out, capped at 10 minutes
+    # after which the stream ends normally. The streaming response cancels
+    # this generator earlier if the client disconnects.
+    try:
+        await asyncio.wait_for(asyncio.get_running_loop().create_future(), 600)
+    except asyncio.TimeoutError:
+        pass
+
+
+# Keyed on (scenario, plan mode enabled); unknown scenarios fall back to direct execution
+SCENARIO_DISPATCH: dict[tuple[str, bool], Callable[..., AsyncGenerator[bytes, None]]] = {
+    ("full_plan_mode", True): run_full_plan_mode,
+    # full_plan_mode only applies when the request enables plan mode
+    ("full_plan_mode", False): run_direct_execution,
+    ("direct_execution", True): run_direct_execution,
+    ("direct_execution", False): run_direct_execution,
+    ("error_mid_execution", True): run_error_mid_execution,
+    ("error_mid_execution", False): run_error_mid_execution,
+    ("multi_clarification", True): run_multi_clarification,
+    ("multi_clarification", False): run_multi_clarification,
+    ("timeout_scenario", True): run_timeout_scenario,
+    ("timeout_scenario", False): run_timeout_scenario,
+}
 
 
 # =============================================================================
@@ -632,17 +853,101 @@ async def run_timeout_scenario(
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan handler."""
-    print(f"Test Agent starting on port {TEST_AGENT_PORT}")
-    print(f"Scenario: {TEST_SCENARIO}")
-    print(f"Event delay: {TEST_AGENT_DELAY_MS}ms")
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    log_handler = logging.handlers.QueueHandler(log_queue)
+    log_listener = logging.handlers.QueueListener(log_queue, logging.StreamHandler(sys.stdout))
+    logger.addHandler(log_handler)
+    log_listener.start()
+    if SESSION_SERVER:
+        sessions.attach_shared(await asyncio.to_thread(connect_shared_sessions))
+    logger.info("Test Agent starting on port %s", TEST_AGENT_PORT)
+    logger.info("Scenario: %s", TEST_SCENARIO)
+    logger.info("Event delay: %sms", TEST_AGENT_DELAY_MS)
     yield
-    print("Test Agent shutting down")
+    logger.info("Test Agent shutting down")
+    logger.removeHandler(log_handler)
+    log_listener.stop()
+
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no"
+}
+# SSE comment line - ignored by EventSource clients, but keeps the connection busy
+SSE_PING = b": ping\n\n"
+# Stream terminator sent after the last frame of every response
+SSE_DONE = b"data: [DONE]\n\n"
+
+
+class SSEResponse(Response):
+    """
+    Server-sent events response for pre-encoded byte frames.
+
+    A slimmer StreamingResponse: frames go straight to the ASGI ``send`` with no
+    per-chunk encode check and no anyio task group. The stream still runs
+    alongside a disconnect watcher, and whichever finishes first cancels the
+    other - long-lived scenarios rely on that to stop when the client leaves.
+    While the stream is idle for ``SSE_PING_S`` a keepalive comment is sent.
+    """
+
+    media_type = "text/event-stream"
+
+    def __init__(self, content: AsyncIterator[bytes]) -> None:
+        self.body_iterator = content
+        self.status_code = 200
+        self.background = None
+        self.init_headers(SSE_HEADERS)
+        self._last_send = 0.0
+
+    async def _stream(self, send: Send) -> None:
+        loop = asyncio.get_running_loop()
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        self._last_send = loop.time()
+        keepalive = asyncio.ensure_future(self._keepalive(send)) if SSE_PING_S > 0 else None
+        try:
+            async for chunk in self.body_iterator:
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                self._last_send = loop.time()
+        finally:
+            if keepalive is not None:
+                keepalive.cancel()
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def _keepalive(self, send: Send) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self._last_send + SSE_PING_S - loop.time())
+            if loop.time() - self._last_send >= SSE_PING_S:
+                await send({"type": "http.response.body", "body": SSE_PING, "more_body": True})
+                self._last_send = loop.time()
+
+    @staticmethod
+    async def _wait_for_disconnect(receive: Receive) -> None:
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        stream = asyncio.ensure_future(self._stream(send))
+        disconnect = asyncio.ensure_future(self._wait_for_disconnect(receive))
+        try:
+            await asyncio.wait((stream, disconnect), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            stream.cancel()
+            disconnect.cancel()
+            await asyncio.gather(stream, disconnect, return_exceptions=True)
+        if not stream.cancelled() and stream.exception() is not None:
+            raise stream.exception()
 
 
 app = FastAPI(
     title="Test Workflow Agent",
     description="E2E test agent for workflow protocol testing",
-    lifespan=lifespan
+    lifespan=lifespan,
+    # Internal test agent - no schema or docs to generate
+    docs_url=None,
+    redoc_url=None,
+    openapi_url=None
 )
 
 
@@ -652,8 +957,7 @@ async def health():
     return {"status": "healthy", "agent_id": AGENT_ID, "scenario": TEST_SCENARIO}
 
 
-@app.post("/")
-async def handle_message(request: Request):
+async def handle_message(request: Request) -> SSEResponse:
     """
     Main A2A message handler.
 
@@ -669,71 +973,42 @@ async def handle_message(request: Request):
         }
     }
     """
-    body = await request.json()
+    body = orjson.loads(await request.body())
 
     method = body.get("method", "")
-    request_id = body.get("id", str(uuid.uuid4()))
+    # Fallback ids are only minted when the client leaves them out
+    request_id = body["id"] if "id" in body else str(uuid.uuid4())
     params = body.get("params", {})
 
-    session_id = params.get("sessionId", str(uuid.uuid4()))
-    workflow_id = params.get("workflowId", str(uuid.uuid4()))
+    session_id = params["sessionId"] if "sessionId" in params else str(uuid.uuid4())
+    workflow_id = params["workflowId"] if "workflowId" in params else str(uuid.uuid4())
     message_obj = params.get("message", {})
 
     # Extract text from message parts
     text_parts = message_obj.get("parts", [])
-    message_text = ""
-    for part in text_parts:
-        if isinstance(part, dict) and "text" in part:
-            message_text = part["text"]
-            break
+    message_text = next((part["text"] for part in text_parts if isinstance(part, dict) and "text" in part), "")
 
     # Check for plan mode flag
     metadata = message_obj.get("metadata", {})
     plan_mode = metadata.get("plan_mode_enabled", False) or params.get("metadata", {}).get("planMode", False)
 
-    print(f"Received message: method={method}, session={session_id}, workflow={workflow_id}")
-    print(f"Plan mode: {plan_mode}, Scenario: {TEST_SCENARIO}")
+    logger.debug("Received message: method=%s, session=%s, workflow=%s", method, session_id, workflow_id)
+    logger.debug("Plan mode: %s, Scenario: %s", plan_mode, TEST_SCENARIO)
 
-    async def generate():
-        """Generate SSE events based on scenario."""
-        scenario = TEST_SCENARIO
+    handler = SCENARIO_DISPATCH.get((TEST_SCENARIO, bool(plan_mode)), run_direct_execution)
+    await sessions.refresh(session_id)
 
-        # Check specific test scenarios first (regardless of plan_mode)
-        if scenario == "error_mid_execution":
-            async for event in run_error_mid_execution(request_id, session_id, workflow_id, message_text):
-                yield event
-        elif scenario == "timeout_scenario":
-            async for event in run_timeout_scenario(request_id, session_id, workflow_id, message_text):
-                yield event
-        elif scenario == "multi_clarification":
-            async for event in run_multi_clarification(request_id, session_id, workflow_id, message_text):
-                yield event
-        elif scenario == "full_plan_mode" and plan_mode:
-            async for event in run_full_plan_mode(request_id, session_id, workflow_id, message_text):
-                yield event
-        elif scenario == "direct_execution" or not plan_mode:
-            async for event in run_direct_execution(request_id, session_id, workflow_id, message_text):
-                yield event
-        else:
-            # Default to direct execution
-            async for event in run_direct_execution(request_id, session_id, workflow_id, message_text):
-                yield event
+    async def generate() -> AsyncGenerator[bytes, None]:
+        """Generate SSE events based on scenario."""
+        async for event in handler(request_id, session_id, workflow_id, message_text):
+            yield event
 
-        yield "data: [DONE]\n\n"
+        yield SSE_DONE
 
-    return StreamingResponse(
-        generate(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no"
-        }
-    )
+    return SSEResponse(generate())
 
 
-@app.post("/a2a/respond")
-async def handle_respond(request: Request):
+async def handle_respond(request: Request) -> SSEResponse:
     """
     Handle clarification/selection/preview responses.
 
@@ -750,27 +1025,33 @@ async def handle_respond(request: Request):
         "approved": true
     }
     """
-    body = await request.json()
+    body = orjson.loads(await request.body())
 
     session_id = body.get("sessionId", "")
     workflow_id = ""
 
-    # Get session and workflow_id
-    if session_id in sessions:
-        workflow_id = sessions[session_id].workflow_id
+    # Get session and workflow_id - another worker may have handled the last request
+    await sessions.refresh(session_id)
+    session = sessions.get(session_id)
+    if session is not None:
+        workflow_id = session.workflow_id
     else:
         workflow_id = str(uuid.uuid4())
 
-    request_id = str(uuid.uuid4())
+    # Only labels the frames of this stream, so a process-unique id is enough
+    request_id = fast_id()
 
     # Determine response type
     clarification_id = body.get("clarificationId")
     selection_id = body.get("selectionId")
     plan_id = body.get("planId")
 
-    print(f"Received respond: session={session_id}, clarification={clarification_id}, selection={selection_id}, plan={plan_id}")
+    logger.debug(
+        "Received respond: session=%s, clarification=%s, selection=%s, plan=%s",
+        session_id, clarification_id, selection_id, plan_id
+    )
 
-    async def generate():
+    async def generate() -> AsyncGenerator[bytes, None]:
         """Generate response based on what type of input was received."""
         scenario = TEST_SCENARIO
 
@@ -780,7 +1061,7 @@ async def handle_respond(request: Request):
             if scenario == "multi_clarification":
                 # Check if this is first or second clarification
                 session = get_or_create_session(session_id, workflow_id)
-                if len(session.clarification_responses) == 0:
+                if not session.clarification_responses:
                     async for event in run_multi_clarification_round2(request_id, session_id, workflow_id, answers):
                         yield event
                 else:
@@ -804,53 +1085,46 @@ async def handle_respond(request: Request):
 
         else:
             # Unknown response type
-            yield json_rpc_response(request_id, {
-                "kind": "status-update",
-                "sessionId": session_id,
-                "status": {
-                    "state": "failed",
-                    "message": {
-                        "role": "assistant",
-                        "parts": [{"text": "Unknown response type"}]
-                    }
-                }
-            })
+            yield render_frame(UNKNOWN_RESPONSE_FRAME, request_id, session_id)
 
-        yield "data: [DONE]\n\n"
+        yield SSE_DONE
 
-    return StreamingResponse(
-        generate(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no"
-        }
-    )
+    return SSEResponse(generate())
+
+
+# The streaming endpoints parse their own bodies and return an ASGI response,
+# so they are plain Starlette routes without FastAPI's dependency resolution
+app.add_route("/", handle_message, methods=["POST"])
+app.add_route("/a2a/respond", handle_respond, methods=["POST"])
 
 
 @app.post("/reset")
 async def reset_state():
     """Reset all session state - useful between test runs."""
-    global sessions
-    sessions = {}
+    await sessions.aclear()
     return {"ok": True, "message": "State reset"}
 
 
 @app.get("/sessions")
 async def get_sessions():
     """Get all active sessions - useful for debugging."""
-    return {
-        "sessions": [
-            {
+    snapshot = await sessions.snapshot()
+
+    async def generate() -> AsyncGenerator[bytes, None]:
+        """Stream the session list one JSON object at a time."""
+        yield b'{"sessions":['
+        separator = b""
+        for s in snapshot:
+            yield separator + orjson.dumps({
                 "session_id": s.session_id,
                 "workflow_id": s.workflow_id,
                 "current_phase": s.current_phase,
                 "created_at": s.created_at
-            }
-            for s in sessions.values()
-        ]
-    }
+            })
+            separator = b","
+        yield b"]}"
+
+    return StreamingResponse(generate(), media_type="application/json")
 
 
 # =============================================================================
@@ -858,9 +1132,51 @@ async def get_sessions():
 # =============================================================================
 
 if __name__ == "__main__":
-    uvicorn.run(
-        app,
-        host="0.0.0.0",
-        port=TEST_AGENT_PORT,
-        log_level="info"
-    )
+    # Server-only imports live here so importing this module stays cheap
+    import uvicorn
+
+    try:
+        import uvloop
+    except ImportError:  # Not available on Windows - fall back to the stdlib loop
+        uvloop = None
+
+    if TEST_AGENT_WORKERS > 1:
+        import threading
+
+        # Serve the shared session table from this supervising process so a
+        # follow-up request can land on any worker
+        authkey = os.urandom(16)
+        session_server = SessionManager(address=("127.0.0.1", 0), authkey=authkey).get_server()
+        threading.Thread(target=session_server.serve_forever, daemon=True).start()
+        os.environ["TEST_AGENT_SESSION_SERVER"] = "%s:%d" % session_server.address
+        os.environ["TEST_AGENT_SESSION_AUTHKEY"] = authkey.hex()
+
+        # Multiple processes need an import string so each worker can load the app
+        uvicorn.run(
+            "main:app",
+            app_dir=os.path.dirname(os.path.abspath(__file__)),
+            host="0.0.0.0",
+            port=TEST_AGENT_PORT,
+            workers=TEST_AGENT_WORKERS,
+            loop="asyncio" if uvloop is None else "uvloop",
+            http="httptools",
+            log_level="warning",
+            access_log=False
+        )
+    else:
+        # Serve directly rather than via uvicorn.run() so we pick the event loop
+        # ourselves; per-request access logging is off as it dominates under load
+        config = uvicorn.Config(
+            app,
+            host="0.0.0.0",
+            port=TEST_AGENT_PORT,
+            # Required rather than "auto" so a missing parser fails loudly instead of falling back to h11
+            http="httptools",
+            log_level="warning",
+            access_log=False
+        )
+        server = uvicorn.Server(config)
+        if uvloop is not None:
+            uvloop.run(server.serve())
+        else:
+            asyncio.run(server.serve())